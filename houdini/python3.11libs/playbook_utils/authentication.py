@@ -1,19 +1,65 @@
 import os
-import json
+import logging
 import base64
+import re
 import requests
-from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 from typing import Optional, Dict, Any
-from playbook_utils.secret_manager import HoudiniSecretsManager
+from urllib3.util.retry import Retry
+from playbook_utils.secret_manager import HoudiniSecretsManager, ensure_env_loaded
+
+# orjson is optional, fall back to the standard library parser when it is not installed
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) timeout in seconds for every auth request
+REQUEST_TIMEOUT = (3, 10)
+
+# Shared session so the token and user info requests reuse the same pooled connection
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    # raise_on_status=False hands the last 5xx response back so the status checks below still run
+    max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504], raise_on_status=False),
+)
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+# Playbook API keys are UUIDs, anything else can be rejected without a network call
+_API_KEY_RE = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+
+# Seconds before the token expiry at which a cached access token is considered stale
+TOKEN_EXPIRY_MARGIN = 30
+
+def _decode_jwt_payload(token: str) -> bytes:
+    """Return the raw JSON bytes of a JWT token's payload section."""
+    # Slice the payload between the first two dots and decode it as url-safe base64
+    start = token.index(".") + 1
+    end = token.index(".", start)
+    payload = token[start:end]
+    padding = "=" * (-len(payload) % 4)
+
+    return base64.urlsafe_b64decode(payload + padding)
+
+def decode_jwt_claims(token: str) -> Dict[str, Any]:
+    """Decode a JWT token and parse its payload claims into a dictionary."""
+    return _json.loads(_decode_jwt_payload(token))
+
+
+def _get_config() -> Dict[str, Optional[str]]:
+    """Return the Playbook endpoints and x-api-key from the cached AWS secret."""
+    secrets = HoudiniSecretsManager.get_secret()
+    return {
+        "alias_url": secrets.get('ALIAS_URL'),
+        "user_url": secrets.get('USER_URL'),
+        "x_api_key": secrets.get('X_API_KEY'),
+    }
 
-def decode_jwt(token: str) -> str:
-    """Decode a JWT token to extract user information."""
-    base64_url = token.split(".")[1]
-    base64_str = base64_url.replace("-", "+").replace("_", "/")
-    padded_base64_str = base64_str + "=" * (4 - len(base64_str) % 4)
-    
-    decoded_bytes = base64.b64decode(padded_base64_str)
-    return decoded_bytes.decode("utf-8")
 
 def get_user_info(api_key: str) -> Optional[Dict[str, Any]]:
     """
@@ -26,58 +72,59 @@ def get_user_info(api_key: str) -> Optional[Dict[str, Any]]:
     """
     try:
         # Get URLs and API key from AWS Secrets Manager
-        secrets = HoudiniSecretsManager.get_secret()
+        config = _get_config()
         
-        alias_url = secrets.get('ALIAS_URL')
-        user_url = secrets.get('USER_URL')
-        x_api_key = secrets.get('X_API_KEY')
+        alias_url = config["alias_url"]
+        user_url = config["user_url"]
+        x_api_key = config["x_api_key"]
         
         if not all([alias_url, user_url, x_api_key]):
-            print("Missing required configuration from AWS Secrets")
+            logger.error("Missing required configuration from AWS Secrets")
             return None
 
         # Get access token using API key
         token_url = f"{alias_url}{api_key}"
-        print(f"Requesting token from: {token_url}")
+        logger.debug("Requesting token from: %s", token_url)
         
-        jwt_request = requests.get(token_url)
+        jwt_request = _SESSION.get(token_url, timeout=REQUEST_TIMEOUT)
         
         if jwt_request.status_code != 200:
-            print(f"Failed to get access token. Status code: {jwt_request.status_code}")
-            print(f"Response: {jwt_request.text}")
+            logger.error("Failed to get access token. Status code: %s", jwt_request.status_code)
+            logger.debug("Response: %s", jwt_request.text)
             return None
 
-        access_token = jwt_request.json()["access_token"]
+        access_token = _json.loads(jwt_request.content)["access_token"]
         
         # Decode JWT to get username
-        decoded_jwt = decode_jwt(access_token)
-        decoded_json = json.loads(decoded_jwt)
+        decoded_json = decode_jwt_claims(access_token)
         username = decoded_json["username"]
 
         # Get user information using username and access token
         info_url = user_url.replace("*", username)
-        print(f"Requesting user info from: {info_url}")
+        logger.debug("Requesting user info from: %s", info_url)
         
         headers = {
             "Authorization": f"Bearer {access_token}",
             "x-api-key": x_api_key
         }
         
-        user_request = requests.get(url=info_url, headers=headers)
+        user_request = _SESSION.get(url=info_url, headers=headers, timeout=REQUEST_TIMEOUT)
         if user_request.status_code != 200:
-            print(f"Failed to get user info. Status code: {user_request.status_code}")
-            print(f"Response: {user_request.text}")
+            logger.error("Failed to get user info. Status code: %s", user_request.status_code)
+            logger.debug("Response: %s", user_request.text)
             return None
 
-        user_data = user_request.json()
-        print(f"User info: {user_data}")
-        return {
+        user_data = _json.loads(user_request.content)
+        logger.debug("User info: %s", user_data)
+        user_info = {
             "email": user_data["email"],
             "credits": user_data["users_tier"]["credits"]
         }
 
+        return user_info
+
     except Exception as e:
-        print(f"Authentication error: {str(e)}")
+        logger.error("Authentication error: %s", e)
         return None
 
 
@@ -87,30 +134,38 @@ def get_user_token() -> str:
     Returns:
         str: The user token.
     """
+    ensure_env_loaded()
     api_key = os.getenv("PLAYBOOK_API_KEY")
 
     if not api_key:
         raise ValueError("Playbook API key not found in environment variables")
-    
-    jwt_request = requests.get(f"{base_url}/token-wrapper/get-tokens/{api_key}")
+
+    alias_url = _get_config()["alias_url"]
+    if not alias_url:
+        raise ValueError("Missing required configuration from AWS Secrets")
+
+    jwt_request = _SESSION.get(f"{alias_url}{api_key}", timeout=REQUEST_TIMEOUT)
 
     try:
         if jwt_request.status_code != 200:
             raise ValueError(f"Failed to get token. Status code: {jwt_request.status_code}")
     except Exception as e:
-        print(f"Error getting token: {e}")
+        logger.error("Error getting token: %s", e)
         raise ValueError("Failed to authenticate with API key")
 
-    return __parse_jwt_data__(jwt_request.json()["access_token"])  
+    return _json.loads(jwt_request.content)["access_token"]
 
 
-def load_dotenv() -> None:
+def is_valid_api_key_format(api_key: str) -> bool:
     """
-    Load the .env file.
+    Check if the provided API key has the correct format, without any network call.
+    Args:
+        api_key (str): The API key to check
+    Returns:
+        bool: True if the API key is a UUID, False otherwise
     """
-    env_path = os.path.join(os.path.dirname(__file__), ".env")
-    load_dotenv(dotenv_path=env_path)
-    
+    return bool(api_key) and _API_KEY_RE.fullmatch(api_key) is not None
+
 
 def validate_api_key(api_key: str) -> bool:
     """
@@ -120,7 +175,7 @@ def validate_api_key(api_key: str) -> bool:
     Returns:
         bool: True if the API key is valid, False otherwise
     """
-    if not api_key or len(api_key) != 36:
+    if not is_valid_api_key_format(api_key):
         return False
     
     user_info = get_user_info(api_key)
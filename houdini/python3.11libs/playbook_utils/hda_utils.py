@@ -1,14 +1,63 @@
 import hou
-import collections
+import itertools
 import requests
-import jwt
-import json
+import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from playbook_utils.authentication import get_user_token
+# orjson is optional, fall back to the standard library when it is not installed
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+
+from playbook_utils.authentication import REQUEST_TIMEOUT, TOKEN_EXPIRY_MARGIN, decode_jwt_claims, get_user_info, get_user_token, is_valid_api_key_format
+
+logger = logging.getLogger(__name__)
 
 BASE_URL = "https://dev-accounts.playbook3d.com"
 
+# Maximum number of masks a user can add on the node
+MAX_NUM_MASKS = 7
+
+# 1-based indices of every mask slot on the node
+MASK_INDICES = tuple(str(i + 1) for i in range(8))
+
+# Maximum number of render passes uploaded at the same time
+MAX_UPLOAD_WORKERS = 8
+
+# (connect, read) timeout in seconds for render pass uploads
+UPLOAD_TIMEOUT = (3, 60)
+
+# Ask for all upload and download URLs in one get-upload-urls?count=N request, which
+# returns a list of {"save_result", "download_url"} pairs. Only enable this once the
+# upload-assets API supports it, otherwise a URL pair is requested per image
+BATCH_ASSET_URLS = False
+
+# Shared session for every Playbook API and S3 request so connections are kept alive.
+# Only GET is retried, an upload body streamed from a file cannot be replayed.
+# The last 5xx response is returned rather than raised so callers can check its status
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=10,
+    max_retries=Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    ),
+)
+_SESSION.mount("http://", _ADAPTER)
+_SESSION.mount("https://", _ADAPTER)
+
+# Playbook API headers, reused until the access token they carry expires
+_HEADERS_CACHE = {"exp": 0, "headers": None}
+
 def add_mask(node: hou.Node):
     """Add a mask by updating the masks multiparm list on the node.
     
@@ -21,7 +70,7 @@ def add_mask(node: hou.Node):
     cur_num_masks = node.parm("masks").eval()
 
     # Allow maximum of 7 masks
-    if cur_num_masks >= 7:
+    if cur_num_masks >= MAX_NUM_MASKS:
         hou.ui.displayMessage("Maximum number of masks reached.")
         return
 
@@ -41,15 +90,18 @@ def authenticate_user(node: hou.Node):
     Raises:
         ValueError: If the API key is invalid or not found
     """
+    # Forget headers built for a previous session
+    _HEADERS_CACHE["headers"] = None
+
     api_key = hou.getenv("PLAYBOOK_API_KEY")
-    if validate_api_key(api_key):
-        # Get user information
-        user_info = get_user_info(api_key)
-        if user_info:
-            email = user_info["email"]
-            node.parm("user_email").set(email)
-            credits = user_info["credits"]
-            node.parm("user_credits").set(credits)
+
+    # Always fetch the user information so the displayed credits are current
+    user_info = get_user_info(api_key) if is_valid_api_key_format(api_key) else None
+    if user_info:
+        email = user_info["email"]
+        node.parm("user_email").set(email)
+        credits = user_info["credits"]
+        node.parm("user_credits").set(credits)
     else:
         hou.ui.displayMessage("Invalid API key. Please make sure the API key present in the package is valid.")
 
@@ -92,13 +144,38 @@ def update_object_merge_nodes(node: hou.Node, index: str = None):
         node (hou.Node): The Houdini node containing the object merge nodes
         index (str, optional): Specific mask index to update. If None, updates all masks
     """
-    indices = get_indices(node, index)
-    check_for_repeated_object_nodes(node, indices)
-    if index:
-        indices = [index]
+    # Share glob results between the duplicate check and the object merge updates
+    glob_cache = {}
+
+    # Duplicates are checked across every mask, even when only one mask changed
+    check_for_repeated_object_nodes(node, get_indices(node), glob_cache)
+
+    for idx in get_indices(node, index):
+        update_selected_objmerge_node(node, idx, glob_cache)
 
-    for idx in indices:
-        update_selected_objmerge_node(node, idx)
+
+def glob_object_nodes(pattern: str, glob_cache: dict = None):
+    """Glob object nodes under /obj matching a pattern.
+
+    This function resolves the pattern against the /obj network. When a cache
+    dictionary is provided, results are memoized per pattern so masks sharing
+    a pattern only glob the scene once.
+
+    Args:
+        pattern (str): The node pattern to match under /obj
+        glob_cache (dict, optional): Pattern to matched nodes cache to read from and fill
+
+    Returns:
+        tuple[hou.Node]: The object nodes matching the pattern
+    """
+    if glob_cache is not None and pattern in glob_cache:
+        return glob_cache[pattern]
+
+    object_nodes = hou.node("/obj").glob(pattern)
+    if glob_cache is not None:
+        glob_cache[pattern] = object_nodes
+
+    return object_nodes
 
 
 def get_indices(node: hou.Node, index: str = None):
@@ -112,15 +189,15 @@ def get_indices(node: hou.Node, index: str = None):
         index (str, optional): Specific index to return. If None, returns all possible indices
 
     Returns:
-        list[str]: List of indices as strings, using 1-based indexing
+        tuple[str]: Tuple of indices as strings, using 1-based indexing
     """
-    max_num_masks = 8
-    all_indices = [str(i + 1) for i in range(max_num_masks)]
+    if index:
+        return (index,)
 
-    return all_indices
+    return MASK_INDICES
 
 
-def check_for_repeated_object_nodes(node: hou.Node, indices: list):
+def check_for_repeated_object_nodes(node: hou.Node, indices: list, glob_cache: dict = None):
     """Check for duplicate object node references in masks.
     
     This function identifies any object nodes that are used in multiple masks
@@ -130,25 +207,33 @@ def check_for_repeated_object_nodes(node: hou.Node, indices: list):
     Args:
         node (hou.Node): The Houdini node to check for duplicates
         indices (list): List of mask indices to check
+        glob_cache (dict, optional): Pattern to matched nodes cache shared between helpers
 
     Raises:
         hou.ui.displayMessage: If duplicate object nodes are found
     """
-    all_object_nodes = []
+    # Track duplicates while gathering so the matched nodes are walked only once
+    seen_object_nodes = set()
+    repeated_object_nodes = []
     for cur_idx in indices:
-        if node.parm(f"objects{cur_idx}"):
-            object_nodes = hou.node("/obj").glob(node.evalParm(f"objects{cur_idx}"))
-            all_object_nodes.extend(object_nodes)
+        objects_parm = node.parm(f"objects{cur_idx}")
+        if not objects_parm:
+            continue
+
+        for object_node in glob_object_nodes(objects_parm.eval(), glob_cache):
+            if object_node not in seen_object_nodes:
+                seen_object_nodes.add(object_node)
+            elif object_node not in repeated_object_nodes:
+                repeated_object_nodes.append(object_node)
 
-    if len(all_object_nodes) != len(set(all_object_nodes)):
-        repeated_object_nodes = [item for item, count in collections.Counter(all_object_nodes).items() if count > 1]
+    if repeated_object_nodes:
         hou.ui.displayMessage(
             f"Warning: The following object nodes are repeated: \n{repeated_object_nodes}\n"
             "Please ensure that each object node is only used once in the masks."
         )
 
 
-def update_selected_objmerge_node(node: hou.Node, idx: str):
+def update_selected_objmerge_node(node: hou.Node, idx: str, glob_cache: dict = None):
     """Update a specific object merge node's configuration.
     
     This function updates the object merge node for a specific mask index,
@@ -158,28 +243,48 @@ def update_selected_objmerge_node(node: hou.Node, idx: str):
     Args:
         node (hou.Node): The Houdini node containing the object merge node
         idx (str): The index of the mask to update
+        glob_cache (dict, optional): Pattern to matched nodes cache shared between helpers
 
     Note:
         - Automatically filters out camera nodes
         - Prevents self-referencing by excluding the current node
     """
     object_merge_nodes = node.glob(f"masks/mask{idx}/object_merge1")
+    objects_parm = node.parm(f"objects{idx}")
+    if not objects_parm:
+        for object_merge_node in object_merge_nodes:
+            numobj_parm = object_merge_node.parm("numobj")
+            if numobj_parm.eval() != 0:
+                numobj_parm.set(0)
+        return
+
+    # The matched objects are the same for every object merge node of this mask
+    object_pattern = objects_parm.eval()
+    # Remove the current HDA node and objects nodes of type cam in a single pass.
+    # The HDA check comes first so its node is never asked for its type
+    object_nodes = [
+        object_node for object_node in glob_object_nodes(object_pattern, glob_cache)
+        if object_node != node and object_node.type().name() != "cam"
+    ]
+
     for object_merge_node in object_merge_nodes:
-        if node.parm(f"objects{idx}"):
-            object_pattern = node.evalParm(f"objects{idx}")
-            object_nodes = hou.node("/obj").glob(object_pattern)
-            # Remove the current HDA node from the object nodes
-            # Also remove objects nodes of type cam
-            object_nodes = [object_node for object_node in object_nodes if object_node.type().name() != "cam"]
-            object_nodes = [object_node for object_node in object_nodes if object_node != node]
-
-            # Set the object nodes in object merge node
-            object_merge_node.parm("numobj").set(0)
-            object_merge_node.parm("numobj").set(len(object_nodes))
-            for j, object_node in enumerate(object_nodes):
-                object_merge_node.parm(f"objpath{j + 1}").set(object_node.path())
-        else:
-            object_merge_node.parm("numobj").set(0)
+        # Set the object nodes in object merge node. Parms are only written when
+        # their value changes to avoid rebuilding the multiparm and recooking
+        numobj_parm = object_merge_node.parm("numobj")
+        if numobj_parm.eval() != len(object_nodes):
+            # Resize first so the objpath parms below exist
+            numobj_parm.set(len(object_nodes))
+
+        # Write all changed paths in one call
+        changed_objpaths = {}
+        for j, object_node in enumerate(object_nodes):
+            objpath_name = f"objpath{j + 1}"
+            object_path = object_node.path()
+            if object_merge_node.parm(objpath_name).unexpandedString() != object_path:
+                changed_objpaths[objpath_name] = object_path
+
+        if changed_objpaths:
+            object_merge_node.setParms(changed_objpaths)
 
 
 def submit_to_playbook(node: hou.Node):
@@ -196,11 +301,11 @@ def submit_to_playbook(node: hou.Node):
     """
     # Render the passes
     hou.ui.setStatusMessage("Rendering passes...")
-    image_data = render(node)
+    image_paths = render(node)
 
     # Upload the render passes in s3 storage
     hou.ui.setStatusMessage("Submitting to Playbook...")
-    download_urls = upload_render_passes(node, image_data)
+    download_urls = upload_render_passes(node, image_paths)
 
     # Download the render from playbook
     hou.ui.setStatusMessage("Downloading render...")
@@ -221,30 +326,23 @@ def update_teams(node: hou.Node):
     Args:
         node (hou.Node): The Houdini node to update teams for
     """
-    teams_list = ["select", "select"]
     # TODO: Get teams data from playbook API. This code is currently not working. 
     teams_url = f"{BASE_URL}/teams"
 
-    user_token = get_user_token()  
-
-    # Note : The X_API_KEY needs to be stored in .env file. It can be retrieved using os.getenv("PLAYBOOK_X_API_KEY")
-    x_api_key = os.getenv("PLAYBOOK_X_API_KEY")
-
-    account_headers = {"Authorization": f"Bearer {user_token}", "x-api-key": x_api_key}
-
-    teams = requests.get(teams_url, headers=account_headers)
+    teams = _SESSION.get(teams_url, headers=_auth_headers(), timeout=REQUEST_TIMEOUT)
     # print(f"teams: {teams.json()}") # Debug
     # Note, teams should be a list of strings
 
     # Team list needs to have a name and value for the houdini dropdown menu. This can be same values. 
 
-    for team in teams.json():
-        teams_list.append(team["name"])
-        teams_list.append(team["name"])
+    teams_list = [
+        "select", "select",
+        *itertools.chain.from_iterable((team["name"], team["name"]) for team in _json.loads(teams.content)),
+    ]
 
     # Cache the teams list data in the node
     # The cached data needs to be of type string
-    node.cacheUserData("teams", json.dumps(teams_list))
+    node.cacheUserData("teams", to_json(teams_list))
 
     # Since the teams data is updated, the workflows needs to be updated as well
     update_workflows(node)
@@ -267,41 +365,49 @@ def update_workflows(node: hou.Node):
     # TODO: Get workflows data from playbook API. This code is currently not working. 
     workflows_url = f"{BASE_URL}/workflows"
 
-    # Note: API Key needs to be satored in .env file. It can be retrieved using os.getenv("PLAYBOOK_API_KEY")
-    api_key = os.getenv("PLAYBOOK_API_KEY")
-
-    user_token = get_user_token()  
-    account_headers = {"Authorization": f"Bearer {user_token}", "x-api-key": api_key}
-
-    workflows = requests.get(workflows_url, headers=account_headers)
+    workflows = _SESSION.get(workflows_url, headers=_auth_headers(), timeout=REQUEST_TIMEOUT)
     # print(f"workflows: {workflows.json()}") # Debug
     # Note, workflows should be a list of strings
 
     # Workflows list needs to have a name and value for the houdini dropdown menu. This can be same values. 
 
-    workflows_list = ["select", "select"]
-    for workflow in workflows.json():
-        workflows_list.append(workflow["name"])
-        workflows_list.append(workflow["name"])
+    workflows_list = [
+        "select", "select",
+        *itertools.chain.from_iterable((workflow["name"], workflow["name"]) for workflow in _json.loads(workflows.content)),
+    ]
 
     # Cache the workflows list data in the node
     # The cached data needs to be of type string
-    node.cacheUserData("workflows", json.dumps(workflows_list))
+    node.cacheUserData("workflows", to_json(workflows_list))
+
+
+def to_json(data) -> str:
+    """Serialize data to a JSON string for caching in node user data.
+
+    Args:
+        data: The JSON serializable data
+
+    Returns:
+        str: The JSON encoded data
+    """
+    encoded = _json.dumps(data)
+    # orjson encodes to bytes, the standard library to str
+    return encoded.decode("utf-8") if isinstance(encoded, bytes) else encoded
 
 
 def render(node):
-    """Render the current node state and collect image data.
+    """Render the current node state and collect the rendered image files.
     
     This function handles the rendering process of the node and collects
-    all the rendered image data for further processing.
+    the file paths written by each render pass for further processing.
 
     Args:
         node: The Houdini node to render
 
     Returns:
-        list: A list containing all rendered image data
+        list: A list containing the file path of every rendered pass
     """
-    all_img_data = []
+    image_paths = []
     render_passes = ["beauty", "depth", "masks", "canny", "normals"]
     cop_path = hou.node(node.path() + "/renderer/cop2net1")
 
@@ -309,27 +415,30 @@ def render(node):
     for render_pass in render_passes:
         cop_out_node = hou.node(cop_path.path() + f"/{render_pass}")
         cop_out_node.parm("execute").pressButton()
-        all_img_data.append(cop_out_node.parm("copoutput").eval())
+        image_paths.append(cop_out_node.parm("copoutput").eval())
 
-    # print(f"Image data: {all_img_data}")
-    return all_img_data
+    # print(f"Image paths: {image_paths}")
+    return image_paths
 
 
-def upload_render_passes(node: hou.Node, image_data: list):
+def upload_render_passes(node: hou.Node, image_paths: list):
     """Upload render passes to Playbook's S3 storage.
     
     This function handles the upload process of rendered images to Playbook's S3 storage.
     It requires a selected team and workflow before uploading. For each image:
     1. Gets an upload URL from Playbook
-    2. Uploads the image data
+    2. Uploads the image
     3. Gets a download URL for later use
 
+    When BATCH_ASSET_URLS is set, all URLs are requested at once and the images are
+    uploaded in parallel instead.
+
     TODO:
     - Implement the complete Playbook API integration for storing render passes in S3
     
     Args:
         node (hou.Node): The Houdini node containing render settings
-        image_data (list): List of rendered images to upload
+        image_paths (list): List of rendered image files to upload
 
     Returns:
         list: List of download URLs for all uploaded images
@@ -338,51 +447,152 @@ def upload_render_passes(node: hou.Node, image_data: list):
         ValueError: If team or workflow is not selected, or if upload process fails
     """
     # TODO: Call playbook API to store the render passes in s3
-    download_urls = []
     selected_team = node.evalParm("team")
     selected_workflow = node.evalParm("workflow")
 
     if selected_team == "select" or selected_workflow == "select":
         raise ValueError("Please select a team and workflow before submitting to Playbook")
 
-    user_token = get_user_token()
-    x_api_key = os.getenv("PLAYBOOK_X_API_KEY")
+    headers = _auth_headers()
+    if BATCH_ASSET_URLS:
+        url_pairs = request_asset_url("get-upload-urls", headers, count=len(image_paths))
+        download_urls = upload_batched_render_passes(image_paths, url_pairs)
+    else:
+        download_urls = upload_sequential_render_passes(image_paths, headers)
+    
+    if not download_urls:
+        raise ValueError("Failed to upload any images successfully")
+    
+    return download_urls
 
-    headers = {"Authorization": f"Bearer {user_token}", "x-api-key": x_api_key}
-    for img_data in image_data:
+
+def upload_batched_render_passes(image_paths: list, url_pairs: list):
+    """Upload render passes in parallel using URL pairs from a batched request.
+
+    Args:
+        image_paths (list): List of rendered image files to upload
+        url_pairs (list): List of {"save_result", "download_url"} dictionaries, one per image
+
+    Returns:
+        list: List of download URLs for the successfully uploaded images
+
+    Raises:
+        ValueError: If the server did not return a URL pair for every image
+    """
+    if not isinstance(url_pairs, list):
+        raise ValueError("Expected a list of upload URLs, the API may not support batched requests")
+
+    if len(url_pairs) < len(image_paths):
+        raise ValueError(f"Expected {len(image_paths)} upload URLs, got {len(url_pairs)}")
+
+    try:
+        url_pairs = [(pair["save_result"], pair["download_url"]) for pair in url_pairs]
+    except (KeyError, TypeError):
+        raise ValueError("Upload URLs response is missing save_result or download_url")
+
+    download_urls = []
+
+    # The uploads are independent, so run them concurrently
+    max_workers = max(1, min(MAX_UPLOAD_WORKERS, len(image_paths)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        uploads = [
+            executor.submit(upload_image, result_url, image_path)
+            for image_path, (result_url, _) in zip(image_paths, url_pairs)
+        ]
+
+        for upload, (_, download_url) in zip(uploads, url_pairs):
+            try:
+                upload.result()
+                logger.debug("Upload successful. Download URL: %s", download_url)
+                download_urls.append(download_url)
+
+            except Exception as e:
+                logger.error("Error uploading image: %s", e)
+                continue  # Continue with next image even if one fails
+
+    return download_urls
+
+
+def upload_sequential_render_passes(image_paths: list, headers: dict):
+    """Upload render passes one at a time, requesting their URLs per image.
+
+    For each image an upload URL is requested, the image is uploaded and then its
+    download URL is requested. Images whose requests fail are skipped.
+
+    Args:
+        image_paths (list): List of rendered image files to upload
+        headers (dict): Playbook API request headers
+
+    Returns:
+        list: List of download URLs for the successfully uploaded images
+    """
+    download_urls = []
+    for image_path in image_paths:
         try:
             # Get upload URL
-            result_request = requests.get(f"{BASE_URL}/upload-assets/get-upload-urls", headers=headers)
-            if result_request.status_code != 200:
-                raise ValueError(f"Failed to get upload URL. Status code: {result_request.status_code}")
-            
-            result_url = result_request.json()["save_result"]
-            print(f"Got upload URL: {result_url}")
-            
+            result_url = request_asset_url("get-upload-urls", headers)
+            logger.debug("Got upload URL: %s", result_url)
+
             # Upload image
-            result_response = requests.put(url=result_url, data=img_data)
-            if result_response.status_code != 200:
-                raise ValueError(f"Failed to upload image. Status code: {result_response.status_code}")
-            
+            upload_image(result_url, image_path)
+
             # Get download URL
-            download_request = requests.get(f"{BASE_URL}/upload-assets/get-download-urls", headers=headers)
-            if download_request.status_code != 200:
-                raise ValueError(f"Failed to get download URL. Status code: {download_request.status_code}")
-            
-            download_url = download_request.json()["save_result"]
-            print(f"Upload successful. Download URL: {download_url}")
+            download_url = request_asset_url("get-download-urls", headers)
+            logger.debug("Upload successful. Download URL: %s", download_url)
             download_urls.append(download_url)
-            
+
         except Exception as e:
-            print(f"Error uploading image: {e}")
+            logger.error("Error uploading image: %s", e)
             continue  # Continue with next image even if one fails
-    
-    if not download_urls:
-        raise ValueError("Failed to upload any images successfully")
-    
+
     return download_urls
 
 
+def upload_image(upload_url: str, image_path: str):
+    """Upload a single render pass to its pre-signed S3 URL.
+
+    The file is streamed from disk so the image is never held in memory as a whole.
+
+    Args:
+        upload_url (str): The pre-signed URL to upload the image to
+        image_path (str): Path of the rendered image file to upload
+
+    Raises:
+        ValueError: If the upload does not succeed
+    """
+    with open(image_path, "rb") as image_file:
+        result_response = _SESSION.put(url=upload_url, data=image_file, timeout=UPLOAD_TIMEOUT)
+    if result_response.status_code != 200:
+        raise ValueError(f"Failed to upload image. Status code: {result_response.status_code}")
+
+
+def request_asset_url(endpoint: str, headers: dict, count: int = None):
+    """Request asset URLs from Playbook's upload-assets API.
+
+    Args:
+        endpoint (str): The upload-assets endpoint, e.g. "get-upload-urls"
+        headers (dict): Playbook API request headers
+        count (int, optional): Number of URL pairs to ask for in a single request
+
+    Returns:
+        str | list: The save_result of the response, a single URL or a list of URL pairs
+
+    Raises:
+        ValueError: If the request fails
+    """
+    params = {"count": count} if count is not None else None
+    url_request = _SESSION.get(
+        f"{BASE_URL}/upload-assets/{endpoint}",
+        headers=headers,
+        params=params,
+        timeout=REQUEST_TIMEOUT,
+    )
+    if url_request.status_code != 200:
+        raise ValueError(f"Failed to get {endpoint}. Status code: {url_request.status_code}")
+
+    return _json.loads(url_request.content)["save_result"]
+
+
 def download_render(node: hou.Node, download_urls: list):
     """Download processed renders from Playbook.
     
@@ -413,11 +623,31 @@ def __parse_jwt_data__(token: str) -> dict | None:
         dict | None: Decoded token data as dictionary if successful, None otherwise
     """
     try:
-        payload_segment = token.split(".")[1]
-        payload_bytes = payload_segment.encode("ascii")
-        payload_json = jwt.utils.base64url_decode(payload_bytes)
-        payload = json.loads(payload_json)
-        return payload
-    except(IndexError, UnicodeDecodeError, ValueError) as e:
-        print(e)
+        return decode_jwt_claims(token)
+    except(UnicodeDecodeError, ValueError) as e:
+        logger.error("Failed to parse JWT data: %s", e)
         raise ValueError
+
+
+def _auth_headers() -> dict:
+    """Build the Playbook API request headers, reusing them while the token is valid.
+
+    The user token is only fetched again once the cached one is within
+    TOKEN_EXPIRY_MARGIN seconds of its exp claim.
+
+    Returns:
+        dict: Authorization and x-api-key headers for Playbook API requests
+    """
+    if _HEADERS_CACHE["headers"] and time.time() < _HEADERS_CACHE["exp"] - TOKEN_EXPIRY_MARGIN:
+        return dict(_HEADERS_CACHE["headers"])
+
+    user_token = get_user_token()
+
+    # Note : The X_API_KEY needs to be stored in .env file. It can be retrieved using os.getenv("PLAYBOOK_X_API_KEY")
+    x_api_key = os.getenv("PLAYBOOK_X_API_KEY")
+
+    headers = {"Authorization": f"Bearer {user_token}", "x-api-key": x_api_key}
+    _HEADERS_CACHE["exp"] = __parse_jwt_data__(user_token).get("exp", 0)
+    _HEADERS_CACHE["headers"] = headers
+
+    return dict(headers)
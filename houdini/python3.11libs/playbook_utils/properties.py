@@ -1,3 +1,5 @@
+import functools
+
 from bpy.props import (
     PointerProperty,
     IntProperty,
@@ -17,6 +19,9 @@ from .ui.icons import get_style_icon
 
 NUM_MASKS_ALLOWED = 7
 
+# Scene attribute names of the per-mask property groups
+mask_property_names = tuple(f"mask_properties{i + 1}" for i in range(NUM_MASKS_ALLOWED))
+
 workflows = [
     (
         "RETEXTURE",
@@ -84,6 +89,17 @@ render_stats = {
 }
 
 
+# Enum items for the prompt styles, limited to the styles of a model when one is given.
+# Styles never change at runtime, so the items are built once per model
+@functools.lru_cache(maxsize=8)
+def get_style_items(model=None):
+    return tuple(
+        (id, name, desc, get_style_icon(icon), i) if icon else (id, name, desc)
+        for i, (id, name, desc, icon) in enumerate(prompt_styles)
+        if model is None or id in styles_in_model[model]
+    )
+
+
 #
 class AuthProperties(PropertyGroup):
     def on_update_user_email(self, context):
@@ -112,18 +128,7 @@ class AuthProperties(PropertyGroup):
 #
 class GlobalProperties(PropertyGroup):
     def get_prompt_styles(self, context):
-        enum_items = []
-        model = self.global_model
-        for i, (id, name, desc, icon) in enumerate(prompt_styles):
-            if id not in styles_in_model[model]:
-                continue
-
-            if icon:
-                enum_items.append((id, name, desc, get_style_icon(icon), i))
-            else:
-                enum_items.append((id, name, desc))
-
-        return enum_items
+        return get_style_items(self.global_model)
 
     def on_update_workflow(self, context):
         context.scene.show_retexture_panel = self.global_workflow == "RETEXTURE"
@@ -169,15 +174,13 @@ class MaskProperties(PropertyGroup):
     # Return a list of the available objects in the scene
     def update_object_dropdown(self, context):
         set_visible_objects(context)
-        items = [(obj.name, obj.name, "") for obj in visible_objects]
-
-        # None option
-        items.insert(0, ("NONE", "Select an object from the scene", ""))
 
-        # Objects currently in masks
-        object_names = [tup for obj_list in mask_objects.values() for tup in obj_list]
+        # Objects currently in masks, as a set for constant time lookups
+        object_names = {tup for obj_list in mask_objects.values() for tup in obj_list}
 
-        items = [item for item in items if item[0] not in object_names]
+        # None option, followed by the visible objects not already in a mask
+        items = [("NONE", "Select an object from the scene", "")]
+        items += [(obj.name, obj.name, "") for obj in visible_objects if obj.name not in object_names]
 
         # More than one option available
         if len(items) > 1:
@@ -192,15 +195,7 @@ class MaskProperties(PropertyGroup):
         return items
 
     def get_prompt_styles(self, context):
-        enum_items = []
-        for i, style in enumerate(prompt_styles):
-            id, name, desc, icon = style
-            if icon:
-                enum_items.append((id, name, desc, get_style_icon(icon), i))
-            else:
-                enum_items.append((id, name, desc))
-
-        return enum_items
+        return get_style_items()
 
     mask_name: StringProperty(
         name="", update=lambda self, context: self.update_mask_name(context)
@@ -284,12 +279,7 @@ class UpscaleProperties(PropertyGroup):
 
     def get_prompt_styles(self, context):
         # Enum items should have an icon if provided
-        enum_items = [
-            (id, name, desc, get_style_icon(icon), i) if icon else (id, name, desc)
-            for i, (id, name, desc, icon) in enumerate(prompt_styles)
-        ]
-
-        return enum_items
+        return get_style_items()
 
     upscale_model: EnumProperty(name="", items=get_prompt_styles)
     upscale_value: EnumProperty(
@@ -338,12 +328,8 @@ def register():
     Scene.show_object_dropdown = BoolProperty(default=False)
     Scene.is_rendering = BoolProperty(default=False)
 
-    for i in range(NUM_MASKS_ALLOWED):
-        setattr(
-            Scene,
-            f"mask_properties{i + 1}",
-            PointerProperty(type=MaskProperties),
-        )
+    for name in mask_property_names:
+        setattr(Scene, name, PointerProperty(type=MaskProperties))
 
 
 def unregister():
@@ -363,5 +349,8 @@ def unregister():
     del Scene.show_object_dropdown
     del Scene.is_rendering
 
-    for i in range(NUM_MASKS_ALLOWED):
-        delattr(Scene, f"mask_properties{i + 1}")
+    for name in mask_property_names:
+        delattr(Scene, name)
+
+    # Drop the cached enum items so they do not outlive the registered icons
+    get_style_items.cache_clear()
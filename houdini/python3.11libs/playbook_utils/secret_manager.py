@@ -1,23 +1,44 @@
-import boto3
-from botocore.exceptions import ClientError
+import functools
 import json
 import os
-from typing import Dict, Any
-from dotenv import load_dotenv
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Any, Tuple
+
+# boto3, botocore and dotenv are imported on first use to keep plugin startup fast
+if TYPE_CHECKING:
+    import boto3
 
-# load .env file
 env_path = os.path.join(os.path.dirname(__file__), ".env")
-load_dotenv(dotenv_path=env_path)
+_ENV_LOADED = False
+
+# (secret_name, region_name) -> (fetch timestamp, secret value)
+_SECRETS_CACHE: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+_SECRETS_LOCK = threading.Lock()
+
+def ensure_env_loaded() -> None:
+    """Load the .env file on first use instead of at import time."""
+    global _ENV_LOADED
+    if not _ENV_LOADED:
+        from dotenv import load_dotenv
+        load_dotenv(dotenv_path=env_path)
+        _ENV_LOADED = True
 
 class HoudiniSecretsManager:
     """
     AWS Secrets Manager client for Houdini plugin
     """
     DEFAULT_REGION = "us-east-2"
+    # Seconds a fetched secret is reused before it is requested again, to pick up rotations
+    SECRET_REFRESH_INTERVAL = 3600
     
     @staticmethod
-    def _get_client(region_name: str = DEFAULT_REGION) -> boto3.client:
+    @functools.lru_cache(maxsize=4)
+    def _get_client(region_name: str = DEFAULT_REGION) -> "boto3.client":
+        ensure_env_loaded()
         try:
+            import boto3
+
             session = boto3.session.Session(
                 aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
                 aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
@@ -28,26 +49,44 @@ class HoudiniSecretsManager:
         except Exception as e:
             raise Exception(f"Failed to initialize AWS client: {str(e)}")
 
+    @staticmethod
+    def clear_cache() -> None:
+        """Drop cached secrets and clients, forcing the next lookup to hit AWS (e.g. after a rotation)."""
+        with _SECRETS_LOCK:
+            _SECRETS_CACHE.clear()
+        HoudiniSecretsManager._get_client.cache_clear()
+
     @staticmethod
     def get_secret(secret_name: str = None, region_name: str = DEFAULT_REGION) -> Dict[str, Any]:
+        ensure_env_loaded()
         if secret_name is None:
             secret_name = os.environ.get('SECRET_NAME')
             if not secret_name:
                 raise ValueError("SECRET_NAME not found in environment variables")
-                
-        client = HoudiniSecretsManager._get_client(region_name)
-        try:
-            response = client.get_secret_value(SecretId=secret_name)
-            
-            if 'SecretString' in response:
-                return json.loads(response['SecretString'])
-            else:
-                raise ValueError(f"Secret {secret_name} has no SecretString")
-        except ClientError as e:
-            error_code = e.response.get('Error', {}).get('Code', 'Unknown')
-            error_message = e.response.get('Error', {}).get('Message', str(e))
-            raise Exception(f"AWS Error ({error_code}): {error_message}")
-        except json.JSONDecodeError as e:
-            raise Exception(f"Failed to parse secret value as JSON: {str(e)}")
-        except Exception as e:
-            raise Exception(f"Unexpected error accessing secret: {str(e)}")
+
+        cache_key = (secret_name, region_name)
+        with _SECRETS_LOCK:
+            cached = _SECRETS_CACHE.get(cache_key)
+            if cached and time.monotonic() - cached[0] < HoudiniSecretsManager.SECRET_REFRESH_INTERVAL:
+                return dict(cached[1])
+
+            from botocore.exceptions import ClientError
+
+            client = HoudiniSecretsManager._get_client(region_name)
+            try:
+                response = client.get_secret_value(SecretId=secret_name)
+
+                if 'SecretString' in response:
+                    secret = json.loads(response['SecretString'])
+                    _SECRETS_CACHE[cache_key] = (time.monotonic(), secret)
+                    return dict(secret)
+                else:
+                    raise ValueError(f"Secret {secret_name} has no SecretString")
+            except ClientError as e:
+                error_code = e.response.get('Error', {}).get('Code', 'Unknown')
+                error_message = e.response.get('Error', {}).get('Message', str(e))
+                raise Exception(f"AWS Error ({error_code}): {error_message}")
+            except json.JSONDecodeError as e:
+                raise Exception(f"Failed to parse secret value as JSON: {str(e)}")
+            except Exception as e:
+                raise Exception(f"Unexpected error accessing secret: {str(e)}")
@@ -0,0 +1,55 @@
+import base64
+import json
+
+import pytest
+
+from playbook_utils.authentication import decode_jwt_claims, is_valid_api_key_format
+
+VALID_API_KEY = "123e4567-e89b-12d3-a456-426614174000"
+
+
+def make_token(claims: dict) -> str:
+    """Build an unsigned JWT with its base64 padding stripped, as real tokens have it."""
+    def encode(data: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(data).encode("utf-8")).rstrip(b"=").decode("ascii")
+
+    return f"{encode({'alg': 'none'})}.{encode(claims)}.signature"
+
+
+def test_valid_api_key_format():
+    assert is_valid_api_key_format(VALID_API_KEY)
+    assert is_valid_api_key_format(VALID_API_KEY.upper())
+
+
+@pytest.mark.parametrize("api_key", [
+    None,
+    "",
+    VALID_API_KEY + "\n",
+    "\n" + VALID_API_KEY,
+    VALID_API_KEY + "0",
+    VALID_API_KEY[:-1],
+    VALID_API_KEY.replace("-", ""),
+    VALID_API_KEY.replace("a", "g"),
+])
+def test_invalid_api_key_format(api_key):
+    assert not is_valid_api_key_format(api_key)
+
+
+@pytest.mark.parametrize("username", ["a", "ab", "abc", "abcd"])
+def test_decode_jwt_claims_padding(username):
+    # Usernames of different lengths give payloads needing 0 to 2 padding characters
+    claims = {"username": username, "exp": 1700000000}
+    assert decode_jwt_claims(make_token(claims)) == claims
+
+
+def test_decode_jwt_claims_urlsafe_alphabet():
+    # Runs of ">" and "?" encode to "-" and "_" in the url-safe base64 alphabet
+    claims = {"username": "???>>>"}
+    token = make_token(claims)
+    assert "-" in token or "_" in token
+    assert decode_jwt_claims(token) == claims
+
+
+def test_decode_jwt_claims_malformed_token():
+    with pytest.raises(ValueError):
+        decode_jwt_claims("not-a-jwt")